@@ -34,15 +34,19 @@ async def main():
         logger.info("Running semantic search queries...")
         logger.info(f"{'='*60}\n")
         
-        for query in queries:
-            logger.info(f"Query: {query}")
-            logger.info("-" * 60)
-            
-            result = await rag_service.search(
+        # Run all queries concurrently so embedding and Endee round-trips overlap
+        results = await asyncio.gather(*(
+            rag_service.search(
                 query=query,
                 top_k=3,
                 use_llm=False  # Set to True if OpenAI API is configured
             )
+            for query in queries
+        ))
+        
+        for query, result in zip(queries, results):
+            logger.info(f"Query: {query}")
+            logger.info("-" * 60)
             
             logger.info(f"Results found: {result['result_count']}")
             logger.info(f"Retrieval time: {result['retrieval_time_ms']:.2f}ms")
@@ -59,7 +63,7 @@ async def main():
             if result['generated_answer']:
                 logger.info(f"\nGenerated Answer:\n{result['generated_answer']}")
             
-            logger.info()
+            logger.info("")
         
         logger.info(f"{'='*60}")
         logger.info("Search examples completed successfully!")
@@ -67,6 +71,8 @@ async def main():
         
     except Exception as e:
         logger.error(f"Error: {str(e)}", exc_info=True)
+    finally:
+        await rag_service.endee_client.aclose()
 
 
 if __name__ == "__main__":
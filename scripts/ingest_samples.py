@@ -168,6 +168,8 @@ async def main():
         
     except Exception as e:
         logger.error(f"Error: {str(e)}", exc_info=True)
+    finally:
+        await rag_service.endee_client.aclose()
 
 
 if __name__ == "__main__":
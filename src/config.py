@@ -1,7 +1,7 @@
 """Configuration management for the RAG system"""
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -11,6 +11,9 @@ class Settings(BaseSettings):
     endee_base_url: str = "http://localhost:8080"
     endee_auth_token: Optional[str] = None
     endee_timeout: int = 30
+    endee_insert_batch_size: int = 256
+    endee_compression: Optional[Literal["gzip", "zstd"]] = None
+    endee_vector_decimals: Optional[int] = None
     
     # API Configuration
     api_host: str = "0.0.0.0"
@@ -20,17 +23,35 @@ class Settings(BaseSettings):
     # Embedding Configuration
     embedding_model: str = "all-MiniLM-L6-v2"
     embedding_dimension: int = 384
+    embedding_backend: Literal["torch", "onnx"] = "torch"
+    embedding_quantization: Literal["fp32", "int8", "fp16"] = "fp32"
+    embedding_batch_size: int = 64
+    embedding_cache_size: int = 10_000
+    embedding_device: Optional[str] = None
+    embedding_num_threads: Optional[int] = None
+    embedding_preload: bool = False
+    embedding_compile: bool = False
+    embedding_disk_cache_dir: Optional[str] = None
+    onnx_model_dir: str = "models/onnx"
     
     # Document Processing
     chunk_size: int = 512
     chunk_overlap: int = 50
     top_k_results: int = 5
+    batch_search_max_queries: int = 64
+    batch_search_concurrency: int = 8
     
     # LLM Configuration
     openai_api_key: Optional[str] = None
     openai_model: str = "gpt-3.5-turbo"
     openai_temperature: float = 0.7
     openai_max_tokens: int = 500
+    answer_cache_size: int = 10_000
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl: float = 300.0
+    search_cache_size: int = 0
+    search_cache_threshold: float = 0.97
+    search_cache_ttl: float = 300.0
     
     # Ollama Configuration (alternative to OpenAI)
     ollama_base_url: Optional[str] = None
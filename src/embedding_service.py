@@ -1,43 +1,465 @@
 """Document embedding and chunking service"""
 
+import functools
 import logging
-from typing import List, Dict, Any
-from uuid import uuid4
+import os
+import threading
+from pathlib import Path
+from typing import Final, List, Dict, Any, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import torch
+import xxhash
 from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
+# Models are shared by every EmbeddingService in the process, keyed on
+# (model_name, backend, quantization, onnx_model_dir, device, compile_model), with
+# options that don't apply to the backend normalized so equivalent configs share a model
+_MODEL_CACHE: Dict[Tuple[str, str, str, Optional[str], str, bool], Any] = {}
+_MODEL_CACHE_LOCK = threading.Lock()
+
+
+def _quantize_onnx(model_path: Path, quantization: str) -> Path:
+    """
+    Get a reduced-precision copy of an exported ONNX model, creating it once
+    
+    Args:
+        model_path: Path of the FP32 ONNX model
+        quantization: Target precision, "fp32", "int8" or "fp16"
+        
+    Returns:
+        Path of the model to load
+    """
+    if quantization == "fp32":
+        return model_path
+    
+    target = model_path.with_name(f"model_{quantization}.onnx")
+    if target.exists():
+        return target
+    
+    logger.info(f"Quantizing {model_path} to {quantization}")
+    if quantization == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        
+        quantize_dynamic(model_path, target, weight_type=QuantType.QInt8)
+    elif quantization == "fp16":
+        import onnx
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+        
+        model = convert_float_to_float16(onnx.load(str(model_path)), keep_io_types=True)
+        onnx.save(model, str(target))
+    else:
+        raise ValueError(f"Unsupported embedding quantization: {quantization}")
+    return target
+
+
+def _quantize_torch(model: SentenceTransformer, quantization: str) -> SentenceTransformer:
+    """
+    Reduce the precision of a loaded PyTorch model
+    
+    Args:
+        model: Loaded sentence-transformer model
+        quantization: Target precision, "fp32", "int8" or "fp16"
+        
+    Returns:
+        The quantized model
+    """
+    if quantization == "int8":
+        # _resolve_runtime has already placed the model on CPU
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if quantization == "fp16":
+        # _resolve_runtime only keeps fp16 for GPU models
+        return model.half()
+    if quantization != "fp32":
+        raise ValueError(f"Unsupported embedding quantization: {quantization}")
+    return model
+
+
+def _compile_torch(model: SentenceTransformer) -> SentenceTransformer:
+    """
+    Compile the transformer forward pass with torch.compile
+    
+    Compilation happens lazily on the first call, so a warmup encode is run
+    here to keep its cost out of the first real request. Falls back to eager
+    execution if compilation fails.
+    
+    Args:
+        model: Loaded sentence-transformer model
+        
+    Returns:
+        The model, compiled when possible
+    """
+    transformer = model[0]
+    try:
+        # Dynamic shapes avoid recompiling for every new batch size and sequence length
+        transformer.compile(dynamic=True)
+        model.encode(["warmup"])
+    except Exception as e:
+        logger.warning(f"torch.compile failed, using eager mode: {str(e)}")
+        # Undo Module.compile()
+        transformer._compiled_call_impl = None
+    return model
+
+
+@functools.lru_cache(maxsize=128)
+def _chunk_spans(length: int, chunk_size: int, chunk_overlap: int) -> np.ndarray:
+    """
+    Compute the (start, end) offsets of the chunks of a document
+    
+    Offsets only depend on the content length, so re-ingested documents and
+    documents of the same size share one cached result.
+    
+    Args:
+        length: Content length in characters
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        
+    Returns:
+        Read-only int64 array of shape (n_chunks, 2) holding start and end
+        offsets in document order
+    """
+    step = chunk_size - chunk_overlap
+    # The last chunk is the first one that reaches the end of the content
+    starts = np.arange(0, max(length - chunk_size, 0) + step, step, dtype=np.int64)
+    spans = np.stack([starts, np.minimum(starts + chunk_size, length)], axis=1)
+    # Cached arrays are shared between callers
+    spans.flags.writeable = False
+    return spans
+
+
+def _chunk_id(document_name: str, index: int, chunk_content: str) -> str:
+    """Deterministic 64-bit xxh3 id of a chunk"""
+    return xxhash.xxh3_64_hexdigest(f"{document_name}:{index}:{chunk_content}".encode())
+
+
+class OnnxEncoder:
+    """Sentence encoder running an exported ONNX graph through ONNX Runtime
+    
+    Mirrors the subset of the ``SentenceTransformer`` API used by
+    ``EmbeddingService`` so the two backends are interchangeable.
+    """
+    
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: str = "models/onnx",
+        quantization: str = "fp32",
+        device: str = "cpu",
+        max_seq_length: int = 256
+    ):
+        """
+        Load (exporting on first use) an ONNX model and its fast tokenizer
+        
+        Args:
+            model_name: Hub id, short sentence-transformers name or local path
+            model_dir: Directory where exported ONNX models are kept
+            quantization: Model precision, "fp32", "int8" or "fp16"
+            device: "cpu" or a CUDA device such as "cuda"
+            max_seq_length: Maximum number of tokens per input text
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        if not os.path.isdir(model_name) and "/" not in model_name:
+            model_name = f"sentence-transformers/{model_name}"
+        
+        export_dir = Path(model_dir) / model_name.strip("/").replace("/", "--")
+        model_path = export_dir / "model.onnx"
+        if not model_path.exists():
+            from optimum.exporters.onnx import main_export
+            
+            logger.info(f"Exporting {model_name} to ONNX at {export_dir}")
+            main_export(
+                model_name,
+                output=export_dir,
+                task="feature-extraction",
+                library_name="transformers"
+            )
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir, use_fast=True)
+        # encode() deliberately tokenizes once and pads per batch
+        self.tokenizer.deprecation_warnings["Asking-to-pad-a-fast-tokenizer"] = True
+        self.max_seq_length = max_seq_length
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(
+            str(_quantize_onnx(model_path, quantization)),
+            sess_options=options,
+            providers=(
+                ["CUDAExecutionProvider", "CPUExecutionProvider"]
+                if device.startswith("cuda")
+                else ["CPUExecutionProvider"]
+            )
+        )
+        self._input_names = {node.name for node in self.session.get_inputs()}
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the size of the pooled sentence embedding"""
+        return self.session.get_outputs()[0].shape[-1]
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode texts into L2-normalized, mean-pooled embeddings
+        
+        All texts are tokenized in a single call to the Rust tokenizer, then
+        batched longest-first by token count so each batch is padded only to
+        lengths similar to its own. Results are returned in input order.
+        
+        Args:
+            sentences: Text or list of texts to encode
+            batch_size: Number of texts per inference call
+            
+        Returns:
+            Array of shape (dimension,) for a single text, else (n, dimension)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        
+        encoded = self.tokenizer(texts, truncation=True, max_length=self.max_seq_length)
+        order = np.argsort([-len(ids) for ids in encoded["input_ids"]], kind="stable")
+        
+        batches = []
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            inputs = self.tokenizer.pad(
+                {name: [values[i] for i in indices] for name, values in encoded.items()},
+                return_tensors="np"
+            )
+            feeds = {name: value for name, value in inputs.items() if name in self._input_names}
+            token_embeddings = self.session.run(None, feeds)[0].astype(np.float32)
+            
+            # Masked mean pooling as one contraction instead of a padded broadcast product
+            mask = inputs["attention_mask"].astype(np.float32)
+            summed = np.einsum("ijk,ij->ik", token_embeddings, mask, optimize=True)
+            pooled = summed / np.maximum(mask.sum(axis=1, keepdims=True), 1e-9)
+            pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+            batches.append(pooled)
+        
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        embeddings = np.ascontiguousarray(np.concatenate(batches)[inverse], dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def _resolve_runtime(
+    backend: str,
+    quantization: str,
+    device: Optional[str]
+) -> Tuple[str, str]:
+    """
+    Pick the device and precision a model will actually run with
+    
+    Args:
+        backend: Inference backend, "torch" or "onnx"
+        quantization: Requested precision, "fp32", "int8" or "fp16"
+        device: Requested device, or None for CUDA when available
+        
+    Returns:
+        Tuple of ("cpu" or a CUDA device, precision)
+    """
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    if backend == "torch" and quantization == "int8" and device != "cpu":
+        # Dynamic int8 quantization only has CPU kernels
+        logger.warning(f"INT8 embeddings run on CPU only; ignoring device {device}")
+        device = "cpu"
+    if backend == "torch" and quantization == "fp16" and device == "cpu":
+        # PyTorch has no fast fp16 matmuls on CPU
+        logger.warning("FP16 embeddings need a GPU; using FP32 on CPU")
+        quantization = "fp32"
+    return device, quantization
+
+
+def load_model(
+    model_name: str,
+    backend: str = "torch",
+    quantization: str = "fp32",
+    onnx_model_dir: str = "models/onnx",
+    device: Optional[str] = None,
+    compile_model: bool = False
+) -> Any:
+    """
+    Get the process-wide instance of a model, loading it on first use
+    
+    Calling this at import time under a pre-fork server (gunicorn --preload)
+    loads the weights once in the master process; workers then share them
+    copy-on-write instead of each loading their own copy.
+    
+    Args:
+        model_name: Name of the sentence-transformer model to use
+        backend: Inference backend, "torch" or "onnx"
+        quantization: Model precision, "fp32", "int8" or "fp16"
+        onnx_model_dir: Directory for exported ONNX models (onnx backend only)
+        device: "cpu" or "cuda"; defaults to CUDA when available (torch int8
+            always runs on CPU, torch fp16 on CPU runs as fp32)
+        compile_model: Compile the model with torch.compile (torch backend only)
+        
+    Returns:
+        SentenceTransformer or OnnxEncoder instance
+    """
+    device, quantization = _resolve_runtime(backend, quantization, device)
+    key = (
+        model_name,
+        backend,
+        quantization,
+        onnx_model_dir if backend == "onnx" else None,
+        device,
+        compile_model and backend == "torch"
+    )
+    
+    # Held while loading so concurrent callers wait for one load instead of racing
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is not None:
+            return model
+        
+        logger.info(
+            f"Loading embedding model: {model_name} "
+            f"({backend} backend, {quantization}, {device})"
+        )
+        if backend == "onnx":
+            model = OnnxEncoder(
+                model_name,
+                model_dir=onnx_model_dir,
+                quantization=quantization,
+                device=device
+            )
+        elif backend == "torch":
+            model = _quantize_torch(
+                SentenceTransformer(model_name, device=device),
+                quantization
+            )
+            if compile_model:
+                model = _compile_torch(model)
+        else:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        
+        _MODEL_CACHE[key] = model
+        return model
+
 
 class EmbeddingService:
     """Service for generating embeddings and processing documents"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    DEFAULT_MODEL: Final = "all-MiniLM-L6-v2"
+    # Output size of DEFAULT_MODEL; ``dimension`` reports the loaded model's actual size
+    DEFAULT_DIMENSION: Final = 384
+    
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        backend: str = "torch",
+        quantization: str = "fp32",
+        onnx_model_dir: str = "models/onnx",
+        batch_size: int = 64,
+        cache_size: int = 10_000,
+        device: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        compile_model: bool = False,
+        disk_cache_dir: Optional[str] = None
+    ):
         """
         Initialize embedding service
         
         Args:
             model_name: Name of the sentence-transformer model to use
+            backend: Inference backend, "torch" or "onnx"
+            quantization: Model precision, "fp32", "int8" or "fp16"
+            onnx_model_dir: Directory for exported ONNX models (onnx backend only)
+            batch_size: Number of texts encoded per forward pass
+            cache_size: Number of single-text embeddings kept in the LRU cache
+            device: "cpu" or "cuda"; defaults to CUDA when available (torch
+                int8 always runs on CPU, torch fp16 on CPU runs as fp32)
+            num_threads: CPU threads used by PyTorch; defaults to PyTorch's choice
+            compile_model: Compile the model with torch.compile at load time
+                (torch backend only); slows startup, speeds up inference
+            disk_cache_dir: Optional directory for a persistent single-text
+                embedding cache shared across processes (requires diskcache)
         """
-        logger.info(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        self._disk_cache = None
+        if disk_cache_dir:
+            import diskcache
+            
+            self._disk_cache = diskcache.Cache(disk_cache_dir)
+        
+        device, quantization = _resolve_runtime(backend, quantization, device)
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        
+        self.model = load_model(
+            model_name,
+            backend=backend,
+            quantization=quantization,
+            onnx_model_dir=onnx_model_dir,
+            device=device,
+            compile_model=compile_model
+        )
+        
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is not None and not tokenizer.is_fast:
+            logger.warning(f"{model_name} loaded a slow Python tokenizer; install tokenizers")
         self.model_name = model_name
+        self.backend = backend
+        self.quantization = quantization
+        self.device = device
+        self.batch_size = batch_size
+        self._embed_cached = functools.lru_cache(maxsize=cache_size)(self._embed_uncached)
         self.dimension = self.model.get_sentence_embedding_dimension()
-        logger.info(f"Model loaded. Dimension: {self.dimension}")
+        logger.info(f"Embedding service ready. Dimension: {self.dimension}")
     
-    def embed_text(self, text: str) -> List[float]:
+    def embed_text(self, text: str, as_list: bool = False) -> Union[np.ndarray, List[float]]:
         """
         Generate embedding for a single text
         
+        Repeated texts (typically search queries) are served from an
+        in-process LRU cache instead of running the model again.
+        
         Args:
             text: Text to embed
+            as_list: Return a list of floats instead of an array; only needed
+                by callers that cannot handle NumPy
             
         Returns:
-            Embedding vector as list of floats
+            Read-only unit-length embedding as a float32 array of shape (dimension,)
         """
-        embedding = self.model.encode(text, convert_to_tensor=False)
-        return embedding.tolist()
+        embedding = self._embed_cached(text)
+        return embedding.tolist() if as_list else embedding
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def _embed_uncached(self, text: str) -> np.ndarray:
+        """Run the model for a single text, consulting the disk cache if enabled"""
+        if self._disk_cache is not None:
+            key = (
+                f"{self.model_name}:{self.backend}:{self.quantization}:"
+                f"{xxhash.xxh3_128_hexdigest(text.encode())}"
+            )
+            stored = self._disk_cache.get(key)
+            if stored is not None:
+                # frombuffer views immutable bytes, so the array is already read-only
+                return np.frombuffer(stored, dtype=np.float32)
+        
+        embedding = self.model.encode(
+            text,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+        # Cached arrays are shared between callers
+        embedding.flags.writeable = False
+        
+        if self._disk_cache is not None:
+            self._disk_cache.set(key, embedding.tobytes())
+        return embedding
+    
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts
         
@@ -45,61 +467,140 @@ class EmbeddingService:
             texts: List of texts to embed
             
         Returns:
-            List of embedding vectors
+            Unit-length embeddings as a float32 array of shape (len(texts), dimension)
         """
-        embeddings = self.model.encode(texts, convert_to_tensor=False)
-        return embeddings.tolist()
+        if not texts:
+            # SentenceTransformer returns shape (0,) for no input
+            return np.empty((0, self.dimension), dtype=np.float32)
+        
+        # Both backends sort by length internally to minimise padding
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.astype(np.float32, copy=False)
     
-    def chunk_document(
+    def iter_chunks(
         self,
         document_name: str,
         content: str,
         chunk_size: int = 512,
-        overlap: int = 50
-    ) -> List[Dict[str, Any]]:
+        chunk_overlap: int = 50
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Split document into overlapping chunks
+        Lazily split document into overlapping chunks
+        
+        Chunk ids are a 64-bit xxh3 hash of the document name, chunk index and
+        chunk content, so re-ingesting an unchanged document reproduces the
+        same ids instead of creating duplicates.
         
         Args:
             document_name: Name/identifier of the document
             content: Document content
             chunk_size: Size of each chunk
-            overlap: Overlap between chunks
+            chunk_overlap: Overlap between chunks
             
-        Returns:
-            List of document chunks with metadata
+        Yields:
+            Document chunks with metadata, in document order
         """
-        chunks = []
-        step = chunk_size - overlap
+        step = chunk_size - chunk_overlap
+        if step <= 0:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        if not content:
+            return
         
-        i = 0
-        while i < len(content):
-            end = min(i + chunk_size, len(content))
-            chunk_content = content[i:end]
-            
-            chunks.append({
-                "id": str(uuid4()),
+        length = len(content)
+        spans = _chunk_spans(length, chunk_size, chunk_overlap)
+        for index, (start, end) in enumerate(spans.tolist()):
+            chunk_content = content[start:end]
+            yield {
+                "id": _chunk_id(document_name, index, chunk_content),
                 "content": chunk_content,
                 "metadata": {
                     "document_name": document_name,
-                    "chunk_index": len(chunks),
-                    "original_length": len(content),
-                    "start_pos": i,
+                    "chunk_index": index,
+                    "original_length": length,
+                    "start_pos": start,
                     "end_pos": end,
                 }
-            })
-            
-            if end >= len(content):
-                break
-            
-            i += step
+            }
+    
+    def chunk_document(
+        self,
+        document_name: str,
+        content: str,
+        chunk_size: int = 512,
+        chunk_overlap: int = 50,
+        overlap: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Split document into overlapping chunks
         
+        Args:
+            document_name: Name/identifier of the document
+            content: Document content
+            chunk_size: Size of each chunk
+            chunk_overlap: Overlap between chunks
+            overlap: Deprecated alias for chunk_overlap
+            
+        Returns:
+            List of document chunks with metadata
+        """
+        if overlap is not None:
+            chunk_overlap = overlap
+        chunks = list(self.iter_chunks(document_name, content, chunk_size, chunk_overlap))
         logger.info(f"Split document '{document_name}' into {len(chunks)} chunks")
         return chunks
     
+    def chunk_document_soa(
+        self,
+        document_name: str,
+        content: str,
+        chunk_size: int = 512,
+        chunk_overlap: int = 50
+    ) -> Dict[str, Any]:
+        """
+        Split and embed a document, returning columns instead of per-chunk dicts
+        
+        Ids and offsets match ``iter_chunks``. Embeddings come back as one
+        contiguous matrix, ready for batched similarity math.
+        
+        Args:
+            document_name: Name/identifier of the document
+            content: Document content
+            chunk_size: Size of each chunk
+            chunk_overlap: Overlap between chunks
+            
+        Returns:
+            Dict with "ids" and "contents" lists, "starts" and "ends" int64 arrays
+            and "embeddings", a float32 array of shape (n_chunks, dimension)
+        """
+        if chunk_size - chunk_overlap <= 0:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        
+        if content:
+            spans = _chunk_spans(len(content), chunk_size, chunk_overlap)
+        else:
+            spans = np.empty((0, 2), dtype=np.int64)
+        contents = [content[start:end] for start, end in spans.tolist()]
+        
+        return {
+            "ids": [_chunk_id(document_name, index, chunk) for index, chunk in enumerate(contents)],
+            "contents": contents,
+            "starts": spans[:, 0],
+            "ends": spans[:, 1],
+            "embeddings": self.embed_texts(contents),
+        }
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the embedding model"""
         return {
             "model": self.model_name,
+            "backend": self.backend,
+            "quantization": self.quantization,
+            "device": self.device,
             "dimension": self.dimension
         }
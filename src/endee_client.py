@@ -1,13 +1,21 @@
 """Endee Vector Database Client"""
 
+import asyncio
+import gzip
+import httpx
+import orjson
+import numpy as np
 import requests
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Union
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = 1024
+
 
 class EndeeClient:
     """Client for interacting with Endee vector database"""
@@ -16,7 +24,10 @@ class EndeeClient:
         self,
         base_url: str = "http://localhost:8080",
         auth_token: Optional[str] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        compression: Optional[str] = None,
+        vector_decimals: Optional[int] = None,
+        async_client: Optional[httpx.AsyncClient] = None
     ):
         """
         Initialize Endee client
@@ -25,10 +36,27 @@ class EndeeClient:
             base_url: Base URL of Endee server
             auth_token: Optional authentication token
             timeout: Request timeout in seconds
+            compression: Optional request body encoding, "gzip" or "zstd";
+                the Endee server must accept the chosen Content-Encoding
+            vector_decimals: Optional number of decimals vector components are
+                rounded to before sending; 4 matches float16 accuracy for unit
+                vectors at roughly 60% of the full-precision JSON size
+            async_client: Optional preconfigured client for the async API, e.g.
+                to share one connection pool between clients; only its pool is
+                used, URL, headers and timeout come from this client; closed by
+                aclose()
         """
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"Unsupported compression: {compression}")
+        if compression == "zstd":
+            # Fail at startup rather than on the first large request
+            import zstandard  # noqa: F401
+        
         self.base_url = base_url.rstrip("/")
         self.auth_token = auth_token
         self.timeout = timeout
+        self.compression = compression
+        self.vector_decimals = vector_decimals
         
         # Setup session with retries
         self.session = requests.Session()
@@ -45,6 +73,66 @@ class EndeeClient:
         self.headers = {"Content-Type": "application/json"}
         if auth_token:
             self.headers["Authorization"] = auth_token
+        
+        # Pooled async client, created on first use inside the event loop
+        self._async_client = async_client
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Shared keep-alive client used by the async API"""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+                # limits must go on the transport: the client ignores them when one is passed
+                transport=httpx.AsyncHTTPTransport(
+                    retries=3,
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+                )
+            )
+        return self._async_client
+    
+    async def aclose(self) -> None:
+        """Close the pooled async client"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    def _encode(self, data: Optional[Dict[str, Any]]) -> Tuple[Optional[bytes], Dict[str, str]]:
+        """
+        Serialize a request body, passing NumPy vectors through natively
+        
+        Args:
+            data: JSON-serializable request data
+            
+        Returns:
+            Encoded body and any extra headers it needs
+        """
+        if data is None:
+            return None, {}
+        
+        body = orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+        if self.compression is None or len(body) < COMPRESSION_MIN_BYTES:
+            return body, {}
+        
+        if self.compression == "zstd":
+            import zstandard
+            
+            body = zstandard.ZstdCompressor(level=1).compress(body)
+        else:
+            body = gzip.compress(body, compresslevel=1)
+        return body, {"Content-Encoding": self.compression}
+    
+    def _prepare_vector(
+        self,
+        values: Union[List[float], np.ndarray]
+    ) -> Union[List[float], np.ndarray]:
+        """Round a vector to the configured precision for a shorter JSON encoding"""
+        if self.vector_decimals is None:
+            return values
+        # float32 keeps orjson's shortest round-trip repr short after rounding
+        return np.round(np.asarray(values, dtype=np.float32), self.vector_decimals)
     
     def _make_request(
         self,
@@ -55,32 +143,59 @@ class EndeeClient:
     ) -> Dict[str, Any]:
         """Make HTTP request to Endee API"""
         url = f"{self.base_url}{endpoint}"
+        body, headers = self._encode(data)
         
         try:
             response = self.session.request(
                 method=method,
                 url=url,
-                json=data,
-                headers=self.headers,
+                data=body,
+                headers={**self.headers, **headers},
                 timeout=self.timeout,
                 **kwargs
             )
             response.raise_for_status()
-            return response.json() if response.text else {}
+            return orjson.loads(response.content) if response.content else {}
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {str(e)}")
             raise
     
-    def health_check(self) -> bool:
+    async def _make_async_request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict[str, Any]] = None,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Make HTTP request to Endee API without blocking the event loop"""
+        url = f"{self.base_url}{endpoint}"
+        body, headers = self._encode(data)
+        
+        try:
+            response = await self.async_client.request(
+                method=method,
+                url=url,
+                content=body,
+                headers={**self.headers, **headers},
+                timeout=self.timeout,
+                **kwargs
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content) if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error(f"Request failed: {str(e)}")
+            raise
+    
+    async def health_check(self) -> bool:
         """Check if Endee server is healthy"""
         try:
-            response = self.session.get(
+            response = await self.async_client.get(
                 f"{self.base_url}/api/v1/health",
                 headers=self.headers,
                 timeout=5
             )
             return response.status_code == 200
-        except:
+        except httpx.HTTPError:
             return False
     
     def create_index(
@@ -126,41 +241,53 @@ class EndeeClient:
         logger.info(f"Deleting index '{name}'")
         self._make_request("DELETE", f"/api/v1/index/{name}")
     
-    def insert(
+    async def insert(
         self,
         index_name: str,
-        vectors: List[Dict[str, Any]]
+        vectors: List[Dict[str, Any]],
+        batch_size: int = 256
     ) -> None:
         """
         Insert vectors into an index
         
+        Vectors are sent as concurrent requests of at most ``batch_size``
+        vectors each, keeping every payload bounded.
+        
         Args:
             index_name: Target index name
-            vectors: List of vector objects with 'id', 'values', and optional 'metadata'
+            vectors: List of vector objects with 'id', 'values' (list or array),
+                and optional 'metadata'
+            batch_size: Maximum number of vectors per request
         """
         logger.info(f"Inserting {len(vectors)} vectors into '{index_name}'")
         
-        payload = {
-            "vectors": [
-                {
-                    "id": v["id"],
-                    "values": v["values"],
-                    **({"metadata": v["metadata"]} if "metadata" in v else {})
-                }
-                for v in vectors
-            ]
-        }
+        payloads = [
+            {
+                "vectors": [
+                    {
+                        "id": v["id"],
+                        "values": self._prepare_vector(v["values"]),
+                        **({"metadata": v["metadata"]} if "metadata" in v else {})
+                    }
+                    for v in vectors[start:start + batch_size]
+                ]
+            }
+            for start in range(0, len(vectors), batch_size)
+        ]
         
-        self._make_request(
-            "POST",
-            f"/api/v1/index/{index_name}/insert",
-            data=payload
-        )
+        await asyncio.gather(*(
+            self._make_async_request(
+                "POST",
+                f"/api/v1/index/{index_name}/insert",
+                data=payload
+            )
+            for payload in payloads
+        ))
     
-    def search(
+    async def search(
         self,
         index_name: str,
-        query_vector: List[float],
+        query_vector: Union[List[float], np.ndarray],
         k: int = 5,
         filter_: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
@@ -176,22 +303,58 @@ class EndeeClient:
         Returns:
             List of search results
         """
-        payload = {
-            "query": query_vector,
-            "k": k
-        }
+        response = await self._make_async_request(
+            "POST",
+            f"/api/v1/index/{index_name}/search",
+            data=self._search_payload(query_vector, k, filter_)
+        )
         
-        if filter_:
-            payload["filter"] = filter_
+        return response.get("results", [])
+    
+    def search_sync(
+        self,
+        index_name: str,
+        query_vector: Union[List[float], np.ndarray],
+        k: int = 5,
+        filter_: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for similar vectors using the blocking session
         
+        Args:
+            index_name: Index to search
+            query_vector: Query vector
+            k: Number of results to return
+            filter_: Optional metadata filter
+            
+        Returns:
+            List of search results
+        """
         response = self._make_request(
             "POST",
             f"/api/v1/index/{index_name}/search",
-            data=payload
+            data=self._search_payload(query_vector, k, filter_)
         )
         
         return response.get("results", [])
     
+    def _search_payload(
+        self,
+        query_vector: Union[List[float], np.ndarray],
+        k: int,
+        filter_: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the request body for a search"""
+        payload = {
+            "query": self._prepare_vector(query_vector),
+            "k": k
+        }
+        
+        if filter_:
+            payload["filter"] = filter_
+        
+        return payload
+    
     def get_vector(self, index_name: str, vector_id: str) -> Optional[Dict[str, Any]]:
         """Get a vector by ID"""
         try:
@@ -212,9 +375,9 @@ class EndeeClient:
             f"/api/v1/index/{index_name}/vector/{vector_id}"
         )
     
-    def get_index_stats(self, index_name: str) -> Dict[str, Any]:
+    async def get_index_stats(self, index_name: str) -> Dict[str, Any]:
         """Get index statistics"""
-        response = self._make_request(
+        response = await self._make_async_request(
             "GET",
             f"/api/v1/index/{index_name}/stats"
         )
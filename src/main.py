@@ -1,15 +1,17 @@
 """FastAPI application for the RAG system"""
 
 import logging
+import time
 from contextlib import asynccontextmanager
 from typing import Optional, List
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from src.config import settings
+from src.embedding_service import load_model
 from src.rag_service import RAGService
 
 # Configure logging
@@ -19,6 +21,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Load the model at import so a pre-fork server (gunicorn --preload) shares it across workers
+if settings.embedding_preload:
+    load_model(
+        settings.embedding_model,
+        backend=settings.embedding_backend,
+        quantization=settings.embedding_quantization,
+        onnx_model_dir=settings.onnx_model_dir,
+        device=settings.embedding_device,
+        compile_model=settings.embedding_compile
+    )
+
 # Global RAG service instance
 rag_service: Optional[RAGService] = None
 
@@ -41,6 +54,19 @@ class SearchResponse(BaseModel):
     result_count: int
 
 
+class BatchSearchRequest(BaseModel):
+    """Request model for batch search"""
+    queries: List[str] = Field(..., max_length=settings.batch_search_max_queries)
+    top_k: Optional[int] = None
+    use_llm: bool = False
+
+
+class BatchSearchResponse(BaseModel):
+    """Response model for batch search"""
+    searches: List[SearchResponse]
+    total_time_ms: float
+
+
 class DocumentIngestionResponse(BaseModel):
     """Response model for document ingestion"""
     document_name: str
@@ -79,6 +105,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down RAG system...")
+    await rag_service.endee_client.aclose()
 
 
 # Create FastAPI app
@@ -106,7 +133,7 @@ async def health_check() -> HealthResponse:
     if not rag_service:
         raise HTTPException(status_code=503, detail="RAG service not initialized")
     
-    endee_connected = rag_service.endee_client.health_check()
+    endee_connected = await rag_service.endee_client.health_check()
     
     return HealthResponse(
         status="healthy" if endee_connected else "degraded",
@@ -214,6 +241,39 @@ async def search(request: SearchRequest) -> SearchResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/v1/search/batch", response_model=BatchSearchResponse)
+async def batch_search(request: BatchSearchRequest) -> BatchSearchResponse:
+    """
+    Semantic search for several queries in one request
+    
+    Args:
+        request: Batch search request with queries and options
+        
+    Returns:
+        Search results for each query, in request order
+    """
+    if not rag_service:
+        raise HTTPException(status_code=503, detail="RAG service not initialized")
+    
+    if not request.queries or not all(request.queries):
+        raise HTTPException(status_code=400, detail="queries must be non-empty strings")
+    
+    try:
+        start_time = time.time()
+        results = await rag_service.batch_search(
+            queries=request.queries,
+            top_k=request.top_k,
+            use_llm=request.use_llm
+        )
+        return BatchSearchResponse(
+            searches=[SearchResponse(**result) for result in results],
+            total_time_ms=(time.time() - start_time) * 1000
+        )
+    except Exception as e:
+        logger.error(f"Error during batch search: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/v1/statistics")
 async def get_statistics() -> dict:
     """Get RAG system statistics"""
@@ -249,6 +309,7 @@ async def root() -> dict:
             "ingest": "POST /api/v1/ingest",
             "ingest_file": "POST /api/v1/ingest-file",
             "search": "POST /api/v1/search",
+            "batch_search": "POST /api/v1/search/batch",
             "statistics": "GET /api/v1/statistics",
             "indices": "GET /api/v1/indices"
         }
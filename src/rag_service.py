@@ -1,16 +1,26 @@
 """RAG (Retrieval-Augmented Generation) service"""
 
+import asyncio
 import logging
 import time
-from typing import List, Dict, Any, Optional
+from asyncio import sleep
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Dict, Any, Optional
+
+import numpy as np
 from openai import OpenAI
 
 from src.endee_client import EndeeClient
 from src.embedding_service import EmbeddingService
 from src.config import settings
+from src.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Characters of each chunk used as LLM context, precomputed at ingestion
+EXCERPT_LENGTH = 300
+
 
 class RAGService:
     """Orchestrates RAG pipeline: ingestion, embedding, storage, retrieval"""
@@ -18,7 +28,8 @@ class RAGService:
     def __init__(
         self,
         index_name: str = "documents",
-        embedding_model: Optional[str] = None
+        embedding_model: Optional[str] = None,
+        embedding_service: Optional[EmbeddingService] = None
     ):
         """
         Initialize RAG service
@@ -26,15 +37,53 @@ class RAGService:
         Args:
             index_name: Name of the vector index
             embedding_model: Name of embedding model to use
+            embedding_service: Already-loaded embedding service to use instead
+                of loading one
         """
         self.index_name = index_name
-        self.embedding_service = EmbeddingService(
-            embedding_model or settings.embedding_model
-        )
+        
+        if embedding_service is not None:
+            self._embedding_future: Future = Future()
+            self._embedding_future.set_result(embedding_service)
+        else:
+            # Load the model in the background so startup overlaps with waiting for Endee
+            loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-loader")
+            self._embedding_future = loader.submit(
+                EmbeddingService,
+                embedding_model or settings.embedding_model,
+                backend=settings.embedding_backend,
+                quantization=settings.embedding_quantization,
+                onnx_model_dir=settings.onnx_model_dir,
+                batch_size=settings.embedding_batch_size,
+                cache_size=settings.embedding_cache_size,
+                device=settings.embedding_device,
+                num_threads=settings.embedding_num_threads,
+                compile_model=settings.embedding_compile,
+                disk_cache_dir=settings.embedding_disk_cache_dir
+            )
+            loader.shutdown(wait=False)
+        
         self.endee_client = EndeeClient(
             base_url=settings.endee_base_url,
             auth_token=settings.endee_auth_token,
-            timeout=settings.endee_timeout
+            timeout=settings.endee_timeout,
+            compression=settings.endee_compression,
+            vector_decimals=settings.endee_vector_decimals
+        )
+        
+        # Answers for semantically equivalent queries are reused instead of calling the LLM;
+        # like the search cache, entries expire so documents ingested elsewhere are picked up
+        self.answer_cache = SemanticCache(
+            max_size=settings.answer_cache_size,
+            threshold=settings.answer_cache_threshold,
+            ttl=settings.answer_cache_ttl
+        )
+        # Near-identical queries reuse retrieval results instead of searching Endee again;
+        # only ingestion in this process clears it, so entries also expire after a TTL
+        self.search_cache = SemanticCache(
+            max_size=settings.search_cache_size,
+            threshold=settings.search_cache_threshold,
+            ttl=settings.search_cache_ttl
         )
         
         # Initialize OpenAI client if configured
@@ -43,27 +92,38 @@ class RAGService:
             self.openai_client = OpenAI(api_key=settings.openai_api_key)
             logger.info("OpenAI client initialized")
     
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        """Embedding service, blocking until the model has finished loading"""
+        return self._embedding_future.result()
+    
     async def initialize(self) -> None:
         """Initialize RAG system by creating index"""
         logger.info("Initializing RAG system...")
         
-        # Wait for Endee to be available
+        # Wait for Endee to be available, backing off exponentially
         max_retries = 10
         for attempt in range(max_retries):
-            if self.endee_client.health_check():
+            if await self.endee_client.health_check():
                 logger.info("Endee server is healthy")
                 break
-            logger.info(f"Waiting for Endee server... (attempt {attempt + 1}/{max_retries})")
-            time.sleep(1)
+            delay = min(2 ** attempt, 10)
+            logger.info(
+                f"Waiting for Endee server... (attempt {attempt + 1}/{max_retries}, "
+                f"retrying in {delay}s)"
+            )
+            await sleep(delay)
         else:
             raise RuntimeError("Endee server is not responding")
         
-        # Create index
-        model_info = self.embedding_service.get_model_info()
+        # Create index once the model (and therefore its dimension) is ready
+        embedding_service = await asyncio.wrap_future(self._embedding_future)
+        model_info = embedding_service.get_model_info()
         self.endee_client.create_index(
             name=self.index_name,
             dimension=model_info["dimension"],
-            metric="cosine"
+            # Embeddings are unit length, so the inner product equals cosine
+            metric="dot"
         )
         
         logger.info("RAG system initialized successfully")
@@ -87,41 +147,108 @@ class RAGService:
         """
         logger.info(f"Ingesting document: {document_name}")
         
-        # Split into chunks
-        chunks = self.embedding_service.chunk_document(
+        chunks = self.embedding_service.iter_chunks(
             document_name=document_name,
             content=content,
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap
         )
         
-        # Generate embeddings
-        texts = [chunk["content"] for chunk in chunks]
-        embeddings = self.embedding_service.embed_texts(texts)
-        
-        # Prepare vectors
-        vectors = []
-        for chunk, embedding in zip(chunks, embeddings):
-            vectors.append({
-                "id": chunk["id"],
-                "values": embedding,
-                "metadata": {
-                    **chunk["metadata"],
-                    "content": chunk["content"],
-                    "source_url": source_url,
-                }
-            })
-        
-        # Insert into Endee
-        self.endee_client.insert(self.index_name, vectors)
-        logger.info(f"Inserted {len(vectors)} vectors for document '{document_name}'")
+        # Embed batch N+1 while batch N is being inserted; the bounded queue
+        # keeps the embedder from running ahead of Endee
+        queue: asyncio.Queue = asyncio.Queue(maxsize=4)
+        producer = asyncio.create_task(self._embed_batches(chunks, queue))
+        try:
+            chunks_added = await self._insert_batches(queue, source_url)
+            await producer
+        except BaseException:
+            producer.cancel()
+            raise
+        
+        logger.info(f"Inserted {chunks_added} vectors for document '{document_name}'")
+        
+        # New content can change the results and best answer for any query
+        self.search_cache.clear()
+        self.answer_cache.clear()
         
         return {
             "document_name": document_name,
-            "chunks_added": len(vectors),
+            "chunks_added": chunks_added,
             "total_content_length": len(content)
         }
     
+    async def _embed_batches(
+        self,
+        chunks: Iterator[Dict[str, Any]],
+        queue: asyncio.Queue
+    ) -> None:
+        """
+        Embed chunks batch by batch and queue them for insertion
+        
+        Args:
+            chunks: Document chunks to embed
+            queue: Queue receiving (chunks, embeddings) pairs, then None
+        """
+        batches = iter(lambda: list(islice(chunks, settings.embedding_batch_size)), [])
+        try:
+            for batch in batches:
+                embeddings = await asyncio.to_thread(
+                    self.embedding_service.embed_texts,
+                    [chunk["content"] for chunk in batch]
+                )
+                await queue.put((batch, embeddings))
+        except Exception:
+            # Let the consumer finish; the error is raised when the producer is awaited
+            await queue.put(None)
+            raise
+        await queue.put(None)
+    
+    async def _insert_batches(
+        self,
+        queue: asyncio.Queue,
+        source_url: Optional[str]
+    ) -> int:
+        """
+        Insert embedded chunks from the queue into Endee
+        
+        Args:
+            queue: Queue of (chunks, embeddings) pairs, terminated by None
+            source_url: Optional URL source of the document
+            
+        Returns:
+            Number of vectors inserted
+        """
+        inserted = 0
+        vectors: List[Dict[str, Any]] = []
+        
+        while True:
+            item = await queue.get()
+            if item is not None:
+                batch, embeddings = item
+                for chunk, embedding in zip(batch, embeddings):
+                    vectors.append({
+                        "id": chunk["id"],
+                        "values": embedding,
+                        "metadata": {
+                            **chunk["metadata"],
+                            "content": chunk["content"],
+                            "excerpt": chunk["content"][:EXCERPT_LENGTH],
+                            "source_url": source_url,
+                        }
+                    })
+            
+            if vectors and (item is None or len(vectors) >= settings.endee_insert_batch_size):
+                await self.endee_client.insert(
+                    self.index_name,
+                    vectors,
+                    batch_size=settings.endee_insert_batch_size
+                )
+                inserted += len(vectors)
+                vectors = []
+            
+            if item is None:
+                return inserted
+    
     async def search(
         self,
         query: str,
@@ -140,29 +267,189 @@ class RAGService:
             Search results with optional generated answer
         """
         start_time = time.time()
-        top_k = top_k or settings.top_k_results
         
         logger.info(f"Searching for: {query}")
         
-        # Generate query embedding
+        # Generate query embedding off the event loop so concurrent searches overlap
+        query_embedding = await asyncio.to_thread(self.embedding_service.embed_text, query)
+        
+        return await self._search_embedding(query, query_embedding, top_k, use_llm, start_time)
+    
+    def search_sync(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        use_llm: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Semantic search for callers without an event loop, e.g. batch scripts
+        
+        Same behaviour and caches as ``search``, with blocking I/O.
+        
+        Args:
+            query: Search query
+            top_k: Number of results to return
+            use_llm: Whether to generate LLM answer
+            
+        Returns:
+            Search results with optional generated answer
+        """
+        start_time = time.time()
+        
+        logger.info(f"Searching for: {query}")
+        
         query_embedding = self.embedding_service.embed_text(query)
+        top_k = top_k or settings.top_k_results
         
         retrieval_start = time.time()
+        results = self._cached_results(query, query_embedding, top_k)
+        if results is None:
+            results = self.endee_client.search_sync(
+                index_name=self.index_name,
+                query_vector=query_embedding,
+                k=top_k
+            )
+            self._cache_results(query_embedding, top_k, results)
+        retrieval_time = (time.time() - retrieval_start) * 1000  # ms
         
-        # Search in Endee
-        results = self.endee_client.search(
-            index_name=self.index_name,
-            query_vector=query_embedding,
-            k=top_k
-        )
+        generated_answer = None
+        if use_llm and results and self.openai_client:
+            generated_answer = self._answer(query, query_embedding, results)
+        
+        return self._search_response(query, results, generated_answer, retrieval_time, start_time)
+    
+    async def batch_search(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        use_llm: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Semantic search for several queries at once
+        
+        All queries are embedded in a single batched forward pass, then
+        searched in Endee concurrently, at most
+        ``settings.batch_search_concurrency`` at a time.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results to return per query
+            use_llm: Whether to generate LLM answers
+            
+        Returns:
+            Search results for each query, in input order
+        """
+        start_time = time.time()
+        
+        logger.info(f"Searching for {len(queries)} queries")
+        
+        query_embeddings = await asyncio.to_thread(self.embedding_service.embed_texts, queries)
+        semaphore = asyncio.Semaphore(settings.batch_search_concurrency)
+        
+        async def bounded_search(query: str, query_embedding: np.ndarray) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._search_embedding(
+                    query, query_embedding, top_k, use_llm, start_time
+                )
+        
+        return list(await asyncio.gather(*(
+            bounded_search(query, query_embedding)
+            for query, query_embedding in zip(queries, query_embeddings)
+        )))
+    
+    async def _search_embedding(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        top_k: Optional[int],
+        use_llm: bool,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """
+        Retrieve results for an embedded query and optionally generate an answer
+        
+        Args:
+            query: Search query
+            query_embedding: Embedding of the query
+            top_k: Number of results to return
+            use_llm: Whether to generate LLM answer
+            start_time: When the request started, for total_time_ms
+            
+        Returns:
+            Search results with optional generated answer
+        """
+        top_k = top_k or settings.top_k_results
+        
+        retrieval_start = time.time()
+        
+        results = self._cached_results(query, query_embedding, top_k)
+        if results is None:
+            # Search in Endee
+            results = await self.endee_client.search(
+                index_name=self.index_name,
+                query_vector=query_embedding,
+                k=top_k
+            )
+            self._cache_results(query_embedding, top_k, results)
         
         retrieval_time = (time.time() - retrieval_start) * 1000  # ms
         
-        # Generate answer with LLM if requested
+        # Generate answer with LLM if requested; the OpenAI client blocks, so keep it off the loop
         generated_answer = None
         if use_llm and results and self.openai_client:
-            generated_answer = await self._generate_answer(query, results)
+            generated_answer = await asyncio.to_thread(
+                self._answer, query, query_embedding, results
+            )
         
+        return self._search_response(query, results, generated_answer, retrieval_time, start_time)
+    
+    def _cached_results(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        top_k: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Look up retrieval results for a near-identical earlier query"""
+        # Entries hold (k, results) so a hit can serve any top_k up to k
+        cached = self.search_cache.get(query_embedding)
+        if cached is None or cached[0] < top_k:
+            return None
+        logger.info(f"Search cache hit for: {query}")
+        return cached[1][:top_k]
+    
+    def _cache_results(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """Store retrieval results for reuse by near-identical queries"""
+        # Empty results usually mean nothing relevant is ingested yet; don't pin that
+        if results:
+            self.search_cache.put(query_embedding, (top_k, results))
+    
+    def _answer(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        results: List[Dict[str, Any]]
+    ) -> str:
+        """Get an LLM answer, reusing one cached for a similar query"""
+        answer = self.answer_cache.get(query_embedding)
+        if answer is not None:
+            logger.info(f"Answer cache hit for: {query}")
+            return answer
+        return self._generate_answer(query, results, query_embedding)
+    
+    @staticmethod
+    def _search_response(
+        query: str,
+        results: List[Dict[str, Any]],
+        generated_answer: Optional[str],
+        retrieval_time: float,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Assemble the search result payload"""
         total_time = (time.time() - start_time) * 1000  # ms
         
         return {
@@ -174,10 +461,11 @@ class RAGService:
             "result_count": len(results)
         }
     
-    async def _generate_answer(
+    def _generate_answer(
         self,
         query: str,
-        results: List[Dict[str, Any]]
+        results: List[Dict[str, Any]],
+        query_embedding: Optional[np.ndarray] = None
     ) -> str:
         """
         Generate answer using LLM with retrieved context
@@ -185,6 +473,8 @@ class RAGService:
         Args:
             query: Original query
             results: Retrieved search results
+            query_embedding: Embedding of the query; successful answers are
+                cached under it
             
         Returns:
             Generated answer
@@ -195,9 +485,11 @@ class RAGService:
         # Build context from results
         context_parts = []
         for i, result in enumerate(results[:3], 1):  # Use top 3
-            content = result.get("metadata", {}).get("content", "")
-            if content:
-                context_parts.append(f"[Document {i}]:\n{content[:300]}...")
+            metadata = result.get("metadata", {})
+            # Vectors ingested before excerpts were stored only have the full content
+            excerpt = metadata.get("excerpt") or metadata.get("content", "")[:EXCERPT_LENGTH]
+            if excerpt:
+                context_parts.append(f"[Document {i}]:\n{excerpt}...")
         
         context = "\n\n".join(context_parts)
         
@@ -218,7 +510,12 @@ class RAGService:
                 temperature=settings.openai_temperature
             )
             
-            return response.choices[0].message.content or "Unable to generate answer"
+            answer = response.choices[0].message.content
+            if not answer:
+                return "Unable to generate answer"
+            if query_embedding is not None:
+                self.answer_cache.put(query_embedding, answer)
+            return answer
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}")
             return "Error generating answer"
@@ -226,7 +523,7 @@ class RAGService:
     async def get_statistics(self) -> Dict[str, Any]:
         """Get system statistics"""
         try:
-            stats = self.endee_client.get_index_stats(self.index_name)
+            stats = await self.endee_client.get_index_stats(self.index_name)
             return stats
         except Exception as e:
             logger.error(f"Error fetching statistics: {str(e)}")
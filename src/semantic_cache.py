@@ -0,0 +1,117 @@
+"""Similarity-keyed LRU cache for embedded queries"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU cache keyed by unit-length embeddings, matched by cosine similarity
+    
+    Safe to share between threads.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        threshold: float = 0.95,
+        ttl: Optional[float] = None
+    ):
+        """
+        Initialize semantic cache
+        
+        Args:
+            max_size: Maximum number of entries; 0 disables the cache
+            threshold: Minimum cosine similarity for a lookup to hit
+            ttl: Seconds an entry stays valid; None keeps entries until evicted
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl = ttl
+        # Keys live in one preallocated matrix so a lookup is a single matrix-vector product
+        self._vectors: Optional[np.ndarray] = None
+        self._expires: Optional[np.ndarray] = None
+        self._values: List[Any] = []
+        # Slot indices from least to most recently used
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        # Lookups reorder the LRU and puts touch several structures, so both need the lock
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._lru)
+    
+    def get(self, embedding: np.ndarray) -> Optional[Any]:
+        """
+        Look up the value stored for the most similar embedding
+        
+        Args:
+            embedding: Unit-length query embedding
+            
+        Returns:
+            Cached value, or None if no entry reaches the threshold
+        """
+        with self._lock:
+            slot = self._match(embedding)
+            if slot is None:
+                return None
+            
+            self._lru.move_to_end(slot)
+            return self._values[slot]
+    
+    def put(self, embedding: np.ndarray, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full
+        
+        An existing entry that the embedding would match is overwritten
+        rather than shadowed by a near-duplicate key.
+        
+        Args:
+            embedding: Unit-length query embedding
+            value: Value to cache
+        """
+        if self.max_size <= 0:
+            return
+        
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_size, len(embedding)), dtype=np.float32)
+                self._expires = np.full(self.max_size, np.inf)
+            
+            # Expired near-duplicates are refreshed in place too
+            slot = self._match(embedding, include_expired=True)
+            if slot is not None:
+                self._values[slot] = value
+            elif len(self._lru) < self.max_size:
+                slot = len(self._lru)
+                self._values.append(value)
+            else:
+                slot, _ = self._lru.popitem(last=False)
+                self._values[slot] = value
+            
+            self._vectors[slot] = embedding
+            if self.ttl is not None:
+                self._expires[slot] = time.monotonic() + self.ttl
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+    
+    def _match(self, embedding: np.ndarray, include_expired: bool = False) -> Optional[int]:
+        """Find the most similar slot at or above the threshold; call with the lock held"""
+        if not self._lru:
+            return None
+        
+        size = len(self._lru)
+        scores = self._vectors[:size] @ embedding
+        if self.ttl is not None and not include_expired:
+            scores = np.where(self._expires[:size] > time.monotonic(), scores, -np.inf)
+        slot = int(np.argmax(scores))
+        return slot if scores[slot] >= self.threshold else None
+    
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._values.clear()
+            self._lru.clear()
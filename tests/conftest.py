@@ -0,0 +1,33 @@
+"""Shared pytest fixtures for RAG system tests"""
+
+import logging
+
+import pytest
+from huggingface_hub import snapshot_download
+
+from src.embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+# Files SentenceTransformer loads; skips ONNX/OpenVINO/TF exports and other weight formats
+_MODEL_FILES = ["*.json", "*.txt", "model.safetensors", "1_Pooling/*"]
+
+
+@pytest.fixture(scope="session")
+def hf_model_cache():
+    """
+    Download the embedding model the tests load, once per session
+    
+    Files go to the standard Hugging Face cache (``HF_HOME``, default
+    ``~/.cache/huggingface``); persisting that directory between CI runs
+    keeps the download out of test time entirely.
+    """
+    repo_id = EmbeddingService.DEFAULT_MODEL
+    if "/" not in repo_id:
+        repo_id = f"sentence-transformers/{repo_id}"
+    
+    try:
+        snapshot_download(repo_id, allow_patterns=_MODEL_FILES)
+    except Exception as e:
+        # Offline runs fall back to whatever is already cached
+        logger.warning(f"Could not pre-download {repo_id}: {str(e)}")